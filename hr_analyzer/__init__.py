@@ -0,0 +1,12 @@
+from hr_analyzer.core import (
+    HR_ZONES,
+    PLOT_RESOLUTIONS,
+    load_fit_file,
+    load_fit_path,
+    load_uploaded_file,
+    count_heart_rates,
+    calculate_metrics,
+    compute_zones,
+    build_hr_figure,
+    build_hist_figure,
+)
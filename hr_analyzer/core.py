@@ -0,0 +1,295 @@
+import streamlit as st
+import polars as pl
+import numpy as np
+import os
+import mmap
+import hashlib
+import tempfile
+import datetime
+from pathlib import Path
+import fitdecode
+from tsdownsample import LTTBDownsampler
+
+# Files larger than this (in bytes) are parsed in place instead of copied
+LARGE_FILE_SIZE = 50_000_000
+
+# Parsed files are kept here as Parquet, named after the SHA-1 of their contents;
+# bump PARQUET_CACHE_VERSION whenever the DataFrame layout changes
+CACHE_DIR = Path.home() / ".cache" / "hr_analyzer"
+PARQUET_CACHE_VERSION = 1
+
+# Fields extracted from each "record" message
+RECORD_FIELDS = ('timestamp', 'heart_rate', 'cadence', 'power', 'distance', 'speed')
+
+# Compact dtypes for numeric fields; fields with gaps fall back to float32
+FIELD_DTYPES = {
+    'heart_rate': np.int16,
+    'cadence': np.int16,
+    'power': np.int32,
+    'distance': np.float32,
+    'speed': np.float32,
+}
+
+# Levels of detail, in points, precomputed for the heart rate time series
+PLOT_RESOLUTIONS = (500, 2000, 5000)
+
+# Heart rate zone boundaries in bpm
+HR_ZONES = (0, 110, 130, 150, 170, 200)
+
+def read_records(source):
+    """Read the record fields of a .fit file with fitdecode, one list per field."""
+    # Collect one list per field rather than one dict per record
+    columns = {name: [] for name in RECORD_FIELDS}
+    with fitdecode.FitReader(source) as fit:
+        for frame in fit:
+            if frame.frame_type == fitdecode.FIT_FRAME_DATA and frame.name == 'record':
+                for name, values in columns.items():
+                    values.append(frame.get_value(name, fallback=None))
+    
+    # fitdecode returns timezone-aware UTC datetimes; keep them naive like the decoder
+    columns['timestamp'] = [ts.replace(tzinfo=None) if isinstance(ts, datetime.datetime) else ts
+                            for ts in columns['timestamp']]
+    
+    return columns
+
+def parse_fit(source):
+    """Extract the record fields of a .fit file as a dict of columns.
+    
+    The source can be bytes or any object exposing the buffer protocol, such
+    as a memoryview or mmap.
+    """
+    # Imported here so numba only loads once a file is parsed
+    from hr_analyzer.fit_decoder import decode_records
+    
+    # Use the compiled decoder, falling back to fitdecode for files it does not handle
+    columns = decode_records(source, RECORD_FIELDS)
+    if columns is None:
+        columns = read_records(source)
+    return columns
+
+def records_frame(source):
+    """Parse the contents of a .fit file into a DataFrame of record fields."""
+    columns = parse_fit(source)
+    
+    for name, dtype in FIELD_DTYPES.items():
+        values = np.array(columns[name], dtype=np.float64)
+        columns[name] = values.astype(np.float32 if np.isnan(values).any() else dtype)
+    
+    # Convert timestamps to datetime64 in one call; polars has no second resolution
+    columns['timestamp'] = np.array(columns['timestamp'], dtype='datetime64[ms]')
+    
+    # Missing values become nulls; drop fields the device never recorded
+    df = pl.DataFrame(columns, nan_to_null=True)
+    return df.select(name for name in df.columns if df[name].null_count() < len(df))
+
+def read_fit_file(source):
+    """Extract heart rate data from the contents of a .fit file.
+    
+    Files parsed in an earlier session are read back from the Parquet cache.
+    """
+    digest = hashlib.sha1(source).hexdigest()
+    cache_path = CACHE_DIR / f"{digest}-v{PARQUET_CACHE_VERSION}.parquet"
+    if cache_path.exists():
+        try:
+            return pl.read_parquet(cache_path)
+        except (OSError, pl.exceptions.PolarsError):
+            # Corrupt or unreadable cache file; parse again and replace it
+            cache_path.unlink(missing_ok=True)
+    
+    df = records_frame(source)
+    
+    # Write to a temporary file first so other sessions never see a partial file;
+    # if the cache is not writable the file is simply parsed again next time
+    tmp_path = None
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        os.close(fd)
+        df.write_parquet(tmp_path, compression='zstd')
+        os.replace(tmp_path, cache_path)
+    except (OSError, pl.exceptions.PolarsError):
+        if tmp_path is not None:
+            Path(tmp_path).unlink(missing_ok=True)
+    
+    return df
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_fit_file(file_bytes):
+    """Load the contents of a .fit file and extract heart rate data."""
+    return read_fit_file(file_bytes)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_large_fit_file(file_key, _source):
+    """Load a large .fit file, cached on file_key instead of hashing its contents."""
+    return read_fit_file(_source)
+
+def load_fit_path(path):
+    """Load a .fit file from disk, memory-mapping it when it is large."""
+    stat = os.stat(path)
+    if stat.st_size <= LARGE_FILE_SIZE:
+        with open(path, "rb") as f:
+            return load_fit_file(f.read())
+    
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return load_large_fit_file((path, stat.st_mtime_ns, stat.st_size), mm)
+
+def load_uploaded_file(uploaded_file):
+    """Load a .fit file from st.file_uploader, parsing large uploads in place."""
+    if uploaded_file.size <= LARGE_FILE_SIZE:
+        return load_fit_file(uploaded_file.getvalue())
+    
+    return load_large_fit_file(uploaded_file.file_id, uploaded_file.getbuffer())
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def lttb_levels(x_bytes, hr_bytes):
+    """Compute LTTB indices for every resolution in PLOT_RESOLUTIONS.
+    
+    Takes the raw int64 x and float64 heart rate buffers so the cache is keyed
+    on their content. Resolutions at or above the series length are omitted.
+    """
+    x = np.frombuffer(x_bytes, dtype=np.int64)
+    hr = np.frombuffer(hr_bytes, dtype=np.float64)
+    downsampler = LTTBDownsampler()
+    return {n_out: downsampler.downsample(x, hr, n_out=n_out)
+            for n_out in PLOT_RESOLUTIONS if n_out < len(hr)}
+
+def downsample(x, hr, n_out):
+    """Reduce the heart rate series to n_out points with LTTB, keeping its peaks and valleys."""
+    levels = lttb_levels(x.astype(np.int64, copy=False).tobytes(),
+                         hr.astype(np.float64).tobytes())
+    if n_out not in levels:
+        return x, hr
+    idx = levels[n_out]
+    return x[idx], hr[idx]
+
+@st.cache_data(show_spinner=False)
+def count_heart_rates(hr_bytes, n):
+    """Count how many of n int16 samples fall on each bpm value.
+    
+    Takes the raw bytes of the array so the cache is keyed on its content.
+    The metrics and the histogram are both derived from these counts.
+    """
+    return np.bincount(np.frombuffer(hr_bytes, dtype=np.int16, count=n), minlength=256)
+
+def compute_histogram(counts, bins=20):
+    """Bin heart rate counts, returning bin centers, widths and counts."""
+    values = np.flatnonzero(counts)
+    hist, edges = np.histogram(values, bins=bins, range=(values[0], values[-1]),
+                               weights=counts[values])
+    return (edges[:-1] + edges[1:]) / 2, np.diff(edges), hist.astype(np.int64)
+
+# Aggregates are derived from the per-bpm counts of count_heart_rates rather
+# than by scanning the samples again.
+
+def compute_zones(counts, zones=HR_ZONES):
+    """Count samples per heart rate zone from per-bpm sample counts.
+    
+    Index 0 holds samples below the first boundary, index i samples in
+    [zones[i-1], zones[i]), and the last index samples at or above zones[-1].
+    """
+    cdf = np.concatenate(([0], np.cumsum(counts)))
+    below = cdf[np.clip(zones, 0, len(counts))]
+    return np.diff(below, prepend=0, append=cdf[-1])
+
+def calculate_metrics(counts):
+    """Calculate heart rate metrics from per-bpm sample counts."""
+    values = np.flatnonzero(counts)
+    cdf = np.cumsum(counts)
+    n = cdf[-1]
+    
+    # Interpolate between order statistics read off the CDF, as np.percentile does
+    pos = (n - 1) * np.array([0.25, 0.5, 0.75])
+    lower = np.floor(pos)
+    below = np.searchsorted(cdf, lower, side='right')
+    above = np.searchsorted(cdf, np.minimum(lower + 1, n - 1), side='right')
+    q1, median, q3 = below + (pos - lower) * (above - below)
+    
+    metrics = {
+        "Average HR": round(np.dot(np.arange(len(counts)), counts) / n, 1),
+        "Min HR": int(values[0]),
+        "Max HR": int(values[-1]),
+        "Q1 (25%)": int(q1),
+        "Median HR": int(median),
+        "Q3 (75%)": int(q3)
+    }
+    return metrics
+
+def _graph_objects():
+    """Import plotly on first use, so the page loads without it until there is data to plot."""
+    import plotly.graph_objects as go
+    import plotly.io as pio
+    
+    # Serialize figures for st.plotly_chart with orjson rather than the json module
+    pio.json.config.default_engine = "orjson"
+    return go
+
+def build_hr_figure(data, n_points=PLOT_RESOLUTIONS[1]):
+    """Build the heart rate time series figure, drawing at most n_points points."""
+    # Check if timestamp exists, otherwise use the sample index
+    has_time = 'timestamp' in data.columns
+    
+    # Skip samples missing a timestamp or heart rate; NaT would wrap to the int64 minimum
+    data = data.with_row_index('point_index').drop_nulls(
+        ['timestamp', 'heart_rate'] if has_time else ['heart_rate'])
+    hr = data['heart_rate'].to_numpy()
+    if has_time:
+        # Epoch milliseconds serialize far smaller than ISO date strings
+        x = data['timestamp'].to_numpy().astype('datetime64[ms]').view('int64')
+        title = "Heart Rate vs. Time"
+    else:
+        x = data['point_index'].to_numpy().astype(np.int64)
+        title = "Heart Rate vs. Data Points"
+    
+    # Identifies the series so zoom survives a resolution change but not a new file
+    revision = hashlib.sha1(x.tobytes() + hr.tobytes()).hexdigest()
+    
+    # Draw with WebGL rather than SVG
+    go = _graph_objects()
+    x, hr = downsample(x, hr, n_points)
+    fig = go.Figure(go.Scattergl(x=x, y=hr, mode='lines'))
+    
+    # Customize the layout
+    fig.update_layout(
+        title=title,
+        template="plotly_white",
+        xaxis_title="Time" if has_time else "Data Points",
+        xaxis_type='date' if has_time else '-',
+        yaxis_title="Heart Rate (bpm)",
+        height=500,
+        # Keep the zoom level when the figure is rebuilt at another resolution
+        uirevision=revision
+    )
+    
+    return fig
+
+def build_hist_figure(counts, metrics):
+    """Build the heart rate distribution figure from per-bpm counts, marking the key metrics."""
+    # Bin with numpy and draw the bars with Plotly
+    go = _graph_objects()
+    centers, widths, bin_counts = compute_histogram(counts)
+    hist_fig = go.Figure(go.Bar(x=centers, y=bin_counts, width=widths))
+    hist_fig.update_layout(
+        title='Heart Rate Distribution',
+        xaxis_title="Heart Rate (bpm)",
+        yaxis_title="Frequency",
+        template="plotly_white",
+        bargap=0
+    )
+    
+    # Add vertical lines for key metrics
+    hist_fig.add_vline(x=metrics['Average HR'], line_dash="solid", line_color="red", 
+                      annotation_text=f"Avg: {metrics['Average HR']} bpm", 
+                      annotation_position="top right")
+    hist_fig.add_vline(x=metrics['Q1 (25%)'], line_dash="dash", line_color="green", 
+                      annotation_text=f"Q1: {metrics['Q1 (25%)']} bpm", 
+                      annotation_position="top right")
+    hist_fig.add_vline(x=metrics['Median HR'], line_dash="dash", line_color="blue", 
+                      annotation_text=f"Median: {metrics['Median HR']} bpm", 
+                      annotation_position="top right")
+    hist_fig.add_vline(x=metrics['Q3 (75%)'], line_dash="dash", line_color="purple", 
+                      annotation_text=f"Q3: {metrics['Q3 (75%)']} bpm", 
+                      annotation_position="top right")
+    
+    hist_fig.update_layout(height=500)
+    
+    return hist_fig
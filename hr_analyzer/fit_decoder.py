@@ -0,0 +1,197 @@
+import numpy as np
+from numba import njit
+
+# Seconds between the Unix epoch and the FIT epoch (1989-12-31 00:00 UTC)
+FIT_EPOCH = 631065600
+
+# Smallest FIT date_time value; anything lower is a relative time
+MIN_DATE_TIME = 0x10000000
+
+RECORD_MESG_NUM = 20
+TIMESTAMP_FIELD_NUM = 253
+COMPRESSED_SPEED_DISTANCE_FIELD_NUM = 8
+
+# Field number and scale of each decoded "record" field
+RECORD_FIELD_NUMS = {
+    'timestamp': (253, 1),
+    'heart_rate': (3, 1),
+    'cadence': (4, 1),
+    'power': (7, 1),
+    'distance': (5, 100),
+    'speed': (6, 1000),
+}
+
+# Size in bytes of the unsigned FIT base types, indexed by base type number
+# (0 for types the decoder does not handle)
+BASE_TYPE_SIZES = np.array([1, 0, 1, 0, 2, 0, 4, 0, 0, 0, 1, 2, 4, 1, 0, 0, 0], dtype=np.int64)
+
+def decode_records(file_bytes, fields):
+    """Decode the given fields from every "record" message of a FIT file.
+
+    Returns a dict of arrays with NaN (NaT for timestamps) for missing values,
+    or None when the file uses features the decoder does not handle.
+    """
+    field_nums = np.array([RECORD_FIELD_NUMS[name][0] for name in fields], dtype=np.int64)
+    values, ok = _decode_records(np.frombuffer(file_bytes, dtype=np.uint8), field_nums)
+    if not ok:
+        return None
+
+    columns = {}
+    for j, name in enumerate(fields):
+        column = values[:, j]
+        if name == 'timestamp':
+            timestamps = np.full(len(column), np.datetime64('NaT'), dtype='datetime64[s]')
+            valid = ~np.isnan(column)
+            timestamps[valid] = (column[valid].astype(np.int64) + FIT_EPOCH).astype('datetime64[s]')
+            column = timestamps
+        elif RECORD_FIELD_NUMS[name][1] != 1:
+            column = column / RECORD_FIELD_NUMS[name][1]
+        columns[name] = column
+    return columns
+
+@njit(cache=True)
+def _read_uint(buf, pos, size, big_endian):
+    value = 0
+    for i in range(size):
+        shift = 8 * (size - 1 - i) if big_endian else 8 * i
+        value |= np.int64(buf[pos + i]) << shift
+    return value
+
+@njit(cache=True)
+def _decode_records(buf, field_nums):
+    n_cols = field_nums.shape[0]
+    ts_col = -1
+    for j in range(n_cols):
+        if field_nums[j] == TIMESTAMP_FIELD_NUM:
+            ts_col = j
+
+    out = np.full((1024, n_cols), np.nan)
+    failed = (out[:0], False)
+
+    # File header
+    if buf.shape[0] < 12:
+        return failed
+    header_size = np.int64(buf[0])
+    if header_size < 12 or buf.shape[0] < header_size:
+        return failed
+    if buf[8] != 46 or buf[9] != 70 or buf[10] != 73 or buf[11] != 84:  # ".FIT"
+        return failed
+    end = header_size + _read_uint(buf, 4, 4, False)
+    if end > buf.shape[0]:
+        return failed
+    # Chained files (more data after this file's CRC) are left to fitdecode
+    if end + 2 < buf.shape[0]:
+        return failed
+
+    # Definitions per local message type
+    defined = np.zeros(16, dtype=np.bool_)
+    mesg_nums = np.zeros(16, dtype=np.int64)
+    big_endian = np.zeros(16, dtype=np.bool_)
+    n_fields = np.zeros(16, dtype=np.int64)
+    mesg_sizes = np.zeros(16, dtype=np.int64)
+    field_defs = np.zeros((16, 255, 3), dtype=np.int64)
+
+    n = 0
+    last_ts = 0
+    pos = header_size
+    while pos < end:
+        header = buf[pos]
+        pos += 1
+        time_offset = -1
+
+        if header & 0x80:
+            # Compressed timestamp header
+            local = (header >> 5) & 0x03
+            time_offset = header & 0x1F
+        elif header & 0x40:
+            # Definition message
+            local = header & 0x0F
+            if pos + 5 > end:
+                return failed
+            big = buf[pos + 1] == 1
+            mesg_num = _read_uint(buf, pos + 2, 2, big)
+            nf = np.int64(buf[pos + 4])
+            pos += 5
+            if pos + 3 * nf > end:
+                return failed
+            size = 0
+            for i in range(nf):
+                field_defs[local, i, 0] = buf[pos]
+                field_defs[local, i, 1] = buf[pos + 1]
+                field_defs[local, i, 2] = buf[pos + 2] & 0x1F
+                size += buf[pos + 1]
+                pos += 3
+            # Developer fields are skipped over by size
+            if header & 0x20:
+                if pos + 1 > end:
+                    return failed
+                n_dev = np.int64(buf[pos])
+                pos += 1
+                if pos + 3 * n_dev > end:
+                    return failed
+                for i in range(n_dev):
+                    size += buf[pos + 1]
+                    pos += 3
+            defined[local] = True
+            mesg_nums[local] = mesg_num
+            big_endian[local] = big
+            n_fields[local] = nf
+            mesg_sizes[local] = size
+            continue
+        else:
+            local = header & 0x0F
+
+        # Data message
+        if not defined[local] or pos + mesg_sizes[local] > end:
+            return failed
+        is_record = mesg_nums[local] == RECORD_MESG_NUM
+        if is_record:
+            if n == out.shape[0]:
+                grown = np.full((2 * n, n_cols), np.nan)
+                grown[:n] = out
+                out = grown
+            n += 1
+
+        p = pos
+        for i in range(n_fields[local]):
+            num = field_defs[local, i, 0]
+            size = field_defs[local, i, 1]
+            base_type = field_defs[local, i, 2]
+            col = -1
+            if is_record:
+                if num == COMPRESSED_SPEED_DISTANCE_FIELD_NUM:
+                    return failed
+                for j in range(n_cols):
+                    if field_nums[j] == num:
+                        col = j
+            if col >= 0 or num == TIMESTAMP_FIELD_NUM:
+                if base_type >= BASE_TYPE_SIZES.shape[0] or BASE_TYPE_SIZES[base_type] != size:
+                    return failed
+                value = _read_uint(buf, p, size, big_endian[local])
+                # uint8z/uint16z/uint32z use 0 as the invalid value, the rest all ones
+                invalid = 0 if base_type >= 10 and base_type <= 12 else (np.int64(1) << (8 * size)) - 1
+                if value != invalid:
+                    if num == TIMESTAMP_FIELD_NUM:
+                        last_ts = value
+                    if col >= 0:
+                        out[n - 1, col] = value
+            p += size
+
+        if time_offset >= 0:
+            # Roll the 5-bit offset forward from the last full timestamp
+            ts = time_offset + (last_ts & ~0x1F)
+            if time_offset < (last_ts & 0x1F):
+                ts += 0x20
+            last_ts = ts
+            if is_record and ts_col >= 0:
+                out[n - 1, ts_col] = ts
+
+        pos += mesg_sizes[local]
+
+    # Relative (device uptime) timestamps are left to fitdecode
+    if ts_col >= 0:
+        for i in range(n):
+            if out[i, ts_col] < MIN_DATE_TIME:
+                return failed
+
+    return out[:n], True
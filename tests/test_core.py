@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import polars as pl
+import pytest
+
+from hr_analyzer import core
+
+SAMPLE_FILE = os.path.join(os.path.dirname(__file__), os.pardir, "17663659706_ACTIVITY.fit")
+
+
+@pytest.fixture(scope="module")
+def sample_bytes():
+    with open(SAMPLE_FILE, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+def test_read_fit_file_writes_parquet_cache(sample_bytes, cache_dir):
+    df = core.read_fit_file(sample_bytes)
+
+    (cache_file,) = cache_dir.glob("*.parquet")
+    assert pl.read_parquet(cache_file).equals(df)
+    assert core.read_fit_file(sample_bytes).equals(df)
+
+
+def test_read_fit_file_replaces_corrupt_cache(sample_bytes, cache_dir):
+    df = core.read_fit_file(sample_bytes)
+    (cache_file,) = cache_dir.glob("*.parquet")
+    cache_file.write_bytes(b"not a parquet file")
+
+    assert core.read_fit_file(sample_bytes).equals(df)
+    assert pl.read_parquet(cache_file).equals(df)
+
+
+def test_read_fit_file_cleans_up_failed_write(sample_bytes, cache_dir, monkeypatch):
+    def fail_write(self, *args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pl.DataFrame, "write_parquet", fail_write)
+
+    assert len(core.read_fit_file(sample_bytes)) > 0
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_build_hr_figure_skips_missing_timestamps(sample_bytes, cache_dir):
+    df = core.read_fit_file(sample_bytes)
+    df = df.with_columns(
+        pl.when(pl.int_range(pl.len()) == 10).then(None).otherwise(pl.col('timestamp')).alias('timestamp'))
+
+    fig = core.build_hr_figure(df, n_points=core.PLOT_RESOLUTIONS[-1])
+
+    x = fig.data[0].x
+    assert len(x) == len(df) - 1
+    assert x.min() == df['timestamp'].drop_nulls().to_numpy().view('int64').min()
+    assert (x[1:] > x[:-1]).all()
+
+
+def test_build_hr_figure_keeps_zoom_only_for_same_data(sample_bytes, cache_dir):
+    df = core.read_fit_file(sample_bytes)
+
+    low, high = (core.build_hr_figure(df, n).layout.uirevision for n in core.PLOT_RESOLUTIONS[:2])
+    other = core.build_hr_figure(df.head(1000)).layout.uirevision
+
+    assert low == high
+    assert other != low
+
+
+def test_compute_zones_matches_digitize():
+    hr = np.array([50, 109, 110, 129, 150, 199, 200, 250, 300], dtype=np.int16)
+    counts = np.bincount(hr, minlength=256)
+
+    expected = np.bincount(np.digitize(hr, core.HR_ZONES), minlength=len(core.HR_ZONES) + 1)
+    np.testing.assert_array_equal(core.compute_zones(counts), expected)
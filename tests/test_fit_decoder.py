@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+import pytest
+
+from hr_analyzer.core import RECORD_FIELDS, read_records
+from hr_analyzer.fit_decoder import decode_records
+
+SAMPLE_FILE = os.path.join(os.path.dirname(__file__), os.pardir, "17663659706_ACTIVITY.fit")
+
+
+@pytest.fixture(scope="module")
+def sample_bytes():
+    with open(SAMPLE_FILE, "rb") as f:
+        return f.read()
+
+
+def test_decoder_matches_fitdecode(sample_bytes):
+    decoded = decode_records(sample_bytes, RECORD_FIELDS)
+    expected = read_records(sample_bytes)
+
+    assert decoded is not None
+    for name in RECORD_FIELDS:
+        if name == 'timestamp':
+            np.testing.assert_array_equal(
+                decoded[name], np.array(expected[name], dtype='datetime64[s]'))
+        else:
+            np.testing.assert_allclose(
+                decoded[name], np.array(expected[name], dtype=np.float64))
+
+
+def test_decoder_leaves_chained_files_to_fitdecode(sample_bytes):
+    chained = sample_bytes + sample_bytes
+
+    assert decode_records(chained, RECORD_FIELDS) is None
+    assert len(read_records(chained)['heart_rate']) == 2 * len(read_records(sample_bytes)['heart_rate'])
+
+
+def test_decoder_rejects_truncated_file(sample_bytes):
+    assert decode_records(sample_bytes[:50], RECORD_FIELDS) is None